@@ -7,21 +7,20 @@ def receive_messages(sock):
     A thread that continuously listens for messages
     from the server socket and prints them out.
     """
-    while True:
-        try:
-            data = sock.recv(1024)
-            if not data:
-                print("Disconnected from server.")
-                break
-            print(data.decode(), end="")
-        except ConnectionResetError:
+    # Buffered reader so that each iteration yields exactly one whole line,
+    # however the server's data was split across TCP segments.
+    stream = sock.makefile("rb", buffering=65536)
+    try:
+        for line in stream:
+            print(line.rstrip(b"\n").decode("utf-8", errors="replace"))
+        print("Disconnected from server.")
+    except OSError as e:
+        if isinstance(e, ConnectionResetError):
             print("Connection forcibly closed by server.")
-            break
-        except:
-            # Generic catch: could be triggered by forced closure
-            break
+        # Otherwise the socket was closed under us, e.g. after /quit
 
     # If we reach here, the receiving thread ends
+    stream.close()
     sock.close()
     sys.exit()
 
@@ -33,8 +32,10 @@ def start_client(server_ip="127.0.0.1", server_port=12345):
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.connect((server_ip, server_port))
+        # Send each typed line right away rather than letting Nagle hold it back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         print(f"Connected to server {server_ip}:{server_port}")
-    except Exception as e:
+    except (OSError, OverflowError, ValueError) as e:
         print(f"Could not connect to server {server_ip}:{server_port}: {e}")
         return
 
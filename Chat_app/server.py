@@ -1,196 +1,333 @@
-import socket
-import threading
+import asyncio
 
+# All connections are driven by a single asyncio event loop (backed by
+# selectors.DefaultSelector: epoll on Linux, kqueue on BSD/macOS), so the shared
+# structures below are only ever touched from one thread and need no lock.
+# Code between two awaits runs atomically with respect to other clients;
+# anything read before an await must be looked up again after it.
 clients = {}
-channels = {}
-lock = threading.Lock()
+connections = {}  # handler task -> writer, for every open connection
+channels = {}  # channel name -> {nickname: ClientWriter} of its members
+nick_channels = {}  # nickname -> set of channel names it has joined
+
+# Encoded "[Channel <name>] <nick>: " prefixes, keyed on (channel, nickname).
+# An entry is evicted whenever that nickname leaves that channel.
+_PREFIX_CACHE = {}
+
+# Banner sent once to every new connection, as a single write.
+_WELCOME = (
+    "Welcome to the chat server!\n"
+    "Use '/nick <yourNickname>' to set your nickname.\n"
+    "Use '/join <channel>' to join a channel.\n"
+    "Use '/send <channel> <message>' to send a message to a channel.\n"
+    "Use '/pm <nick> <message>' to send a private message.\n"
+    "Use '/quit' to disconnect.\n\n"
+).encode()
+
+# Fixed replies, encoded once at import time.
+_ERR_NICK_EMPTY = b"Nickname cannot be empty.\n"
+_ERR_NICK_TAKEN = b"Nickname already taken. Try another one.\n"
+_ERR_CHANNEL_EMPTY = b"Channel name cannot be empty.\n"
+_ERR_NEED_NICK_JOIN = b"You must set a nickname before joining channels.\n"
+_ERR_NEED_NICK_SEND = b"You must set a nickname before sending messages.\n"
+_ERR_NEED_NICK_PM = b"You must set a nickname before sending private messages.\n"
+_ERR_UNKNOWN = b"Unknown command. Try /nick, /join, /send, /pm, or /quit.\n"
+_USAGE_SEND = b"Usage: /send <channel> <message>\n"
+_USAGE_PM = b"Usage: /pm <nick> <message>\n"
+_BYE = b"Disconnecting...\n"
+
+class ClientWriter:
+    """
+    Outbound buffer for one client connection.
+    Messages pushed between two wakeups of the writer task are sent
+    to the socket together as a single write. A client with more than
+    MAX_BUF bytes pending, here or in the transport, is disconnected
+    rather than buffered for.
+    """
+
+    MAX_BUF = 1 << 20
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.buf = bytearray()
+        self.ev = asyncio.Event()
+        self.closing = False
+        self.dead = False
+        self.task = asyncio.create_task(self._run())
+
+    def push(self, *parts):
+        """
+        Queue the concatenation of 'parts' for sending; never blocks the caller.
+        The parts are copied straight into the buffer, so callers never need
+        to join them into one bytes object first.
+        """
+        if self.dead:
+            return
+        pending = len(self.buf) + self.writer.transport.get_write_buffer_size()
+        if pending + sum(map(len, parts)) > self.MAX_BUF:
+            # Slow consumer: drop it instead of stalling or growing without bound
+            self.mark_dead()
+            return
+        for part in parts:
+            self.buf += part
+        self.ev.set()
+
+    def mark_dead(self):
+        """
+        Discard anything queued and abort the connection; the client's
+        handler then sees EOF and runs its normal disconnect cleanup.
+        """
+        self.dead = True
+        self.buf.clear()
+        self.ev.set()
+        self.writer.transport.abort()
+
+    async def _run(self):
+        while not self.dead and not (self.closing and not self.buf):
+            await self.ev.wait()
+            self.ev.clear()
+            if not self.buf:
+                continue
+            chunk = bytes(self.buf)
+            self.buf.clear()
+            self.writer.write(chunk)
+            try:
+                await self.writer.drain()
+            except OSError:
+                self.mark_dead()
+
+    async def aclose(self):
+        """
+        Flush whatever is still queued, then close the connection.
+        """
+        self.closing = True
+        self.ev.set()
+        await self.task
+        if not self.dead:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
 
 def broadcast_channel_message(sender_nick, channel_name, message):
     """
     Send 'message' to all clients in 'channel_name', coming from 'sender_nick'.
     """
-    with lock:
-        if channel_name not in channels:
-            return  # Channel doesn't exist or no one is in it
-
-        for nickname in channels[channel_name]:
-            if nickname in clients and nickname != sender_nick:
-                try:
-                    clients[nickname].sendall(f"[Channel {channel_name}] {sender_nick}: {message}\n".encode())
-                except:
-                    # If sending fails, we ignore or remove the client
-                    pass
+    members = channels.get(channel_name)
+    if not members:
+        return  # Channel doesn't exist or no one is in it
+
+    # The prefix is cached per (channel, sender); both parts are shared by every recipient
+    key = (channel_name, sender_nick)
+    header = _PREFIX_CACHE.get(key)
+    if header is None:
+        header = _PREFIX_CACHE[key] = f"[Channel {channel_name}] {sender_nick}: ".encode()
+    body = message.encode()
+    for nickname, client in members.items():
+        if nickname != sender_nick:
+            client.push(header, body, b"\n")
 
 def private_message(sender_nick, target_nick, message):
     """
     Send a private message to 'target_nick' from 'sender_nick'.
     """
-    with lock:
-        if target_nick not in clients:
-            # Let sender know the target does not exist
-            if sender_nick in clients:
-                clients[sender_nick].sendall(f"User '{target_nick}' not found.\n".encode())
-            return
+    if target_nick not in clients:
+        # Let sender know the target does not exist
+        if sender_nick in clients:
+            clients[sender_nick].push(b"User '", target_nick.encode(), b"' not found.\n")
+        return
 
-        try:
-            clients[target_nick].sendall(f"[Private] {sender_nick}: {message}\n".encode())
-        except:
-            pass
+    clients[target_nick].push(b"[Private] ", sender_nick.encode(), b": ", message.encode(), b"\n")
 
-def handle_client_connection(client_socket, client_address):
+def _evict(nickname):
+    """
+    Remove 'nickname' from clients and from every channel it had joined,
+    deleting channels left empty and their cached prefixes.
     """
-    Thread target for handling each client connection:
+    clients.pop(nickname, None)
+    for ch in nick_channels.pop(nickname, ()):
+        members = channels[ch]
+        del members[nickname]
+        _PREFIX_CACHE.pop((ch, nickname), None)
+        if not members:
+            del channels[ch]
+
+# Each command handler takes (client, nickname, rest-of-line) and returns
+# the client's nickname after the command, which only /nick changes.
+
+def _do_nick(client, nickname, rest):
+    # /nick <name>
+    desired_nick = rest.strip()
+    if not desired_nick:
+        client.push(_ERR_NICK_EMPTY)
+        return nickname
+
+    if desired_nick in clients:
+        client.push(_ERR_NICK_TAKEN)
+        return nickname
+
+    # Remove old nickname from data structures if it existed
+    if nickname:
+        _evict(nickname)
+
+    # Set new nickname
+    nickname = desired_nick
+    clients[nickname] = client
+    client.push(b"Nickname set to '", nickname.encode(), b"'.\n")
+    return nickname
+
+def _do_join(client, nickname, rest):
+    # /join <channel>
+    channel_name = rest.strip()
+    if not channel_name:
+        client.push(_ERR_CHANNEL_EMPTY)
+        return nickname
+
+    if not nickname:
+        client.push(_ERR_NEED_NICK_JOIN)
+        return nickname
+
+    channels.setdefault(channel_name, {})[nickname] = client
+    nick_channels.setdefault(nickname, set()).add(channel_name)
+
+    client.push(b"You have joined channel '", channel_name.encode(), b"'.\n")
+    return nickname
+
+def _do_send(client, nickname, rest):
+    # /send <channel> <message>
+    parts = rest.split(" ", 1)
+    if len(parts) < 2:
+        client.push(_USAGE_SEND)
+        return nickname
+
+    channel_name, msg = parts
+    if not nickname:
+        client.push(_ERR_NEED_NICK_SEND)
+        return nickname
+
+    members = channels.get(channel_name)
+    if members is None or nickname not in members:
+        client.push(b"You must join channel '", channel_name.encode(), b"' before sending messages there.\n")
+        return nickname
+
+    # Broadcast this message to the channel
+    broadcast_channel_message(nickname, channel_name, msg)
+    return nickname
+
+def _do_pm(client, nickname, rest):
+    # /pm <targetNick> <message>
+    parts = rest.split(" ", 1)
+    if len(parts) < 2:
+        client.push(_USAGE_PM)
+        return nickname
+
+    target_nick, msg = parts
+    if not nickname:
+        client.push(_ERR_NEED_NICK_PM)
+        return nickname
+
+    private_message(nickname, target_nick, msg)
+    return nickname
+
+HANDLERS = {
+    "/nick": _do_nick,
+    "/join": _do_join,
+    "/send": _do_send,
+    "/pm": _do_pm,
+}
+
+async def handle(reader, writer):
+    """
+    Coroutine handling each client connection:
     - Reads commands/messages from the client.
     - Updates global structures accordingly.
     - Forwards messages to the appropriate recipients.
     """
+    client_address = writer.get_extra_info("peername")
+    print(f"New connection from {client_address}")
+    client = ClientWriter(writer)
+    # Tracked so that main() can drop the connection on shutdown
+    task = asyncio.current_task()
+    connections[task] = client
+    task.add_done_callback(connections.pop)
     nickname = None
 
     # Send a welcome message
-    client_socket.sendall("Welcome to the chat server!\n".encode())
-    client_socket.sendall("Use '/nick <yourNickname>' to set your nickname.\n".encode())
-    client_socket.sendall("Use '/join <channel>' to join a channel.\n".encode())
-    client_socket.sendall("Use '/send <channel> <message>' to send a message to a channel.\n".encode())
-    client_socket.sendall("Use '/pm <nick> <message>' to send a private message.\n".encode())
-    client_socket.sendall("Use '/quit' to disconnect.\n\n".encode())
+    client.push(_WELCOME)
 
     while True:
         try:
-            data = client_socket.recv(1024)
-        except ConnectionResetError:
+            line = await reader.readline()
+        except OSError:
             # Client disconnected unexpectedly
-            data = None
+            line = None
+        except ValueError:
+            # Line longer than the reader's buffer limit; drop the client
+            line = None
 
-        if not data:
+        if not line:
             # This means client has disconnected
             break
 
-        message = data.decode().strip()
-        if not message:
+        line = line.strip()
+        if not line:
             continue  # Empty line, just ignore
 
-        # Command parsing
-        if message.startswith("/nick "):
-            # /nick <name>
-            desired_nick = message.split(" ", 1)[1].strip()
-            if not desired_nick:
-                client_socket.sendall("Nickname cannot be empty.\n".encode())
-                continue
-
-            with lock:
-                if desired_nick in clients:
-                    client_socket.sendall("Nickname already taken. Try another one.\n".encode())
-                else:
-                    # Remove old nickname from data structures if it existed
-                    if nickname and nickname in clients:
-                        del clients[nickname]
-                        # Also remove from all channels
-                        for ch in channels.values():
-                            if nickname in ch:
-                                ch.remove(nickname)
-
-                    # Set new nickname
-                    nickname = desired_nick
-                    clients[nickname] = client_socket
-                    client_socket.sendall(f"Nickname set to '{nickname}'.\n".encode())
-
-        elif message.startswith("/join "):
-            # /join <channel>
-            channel_name = message.split(" ", 1)[1].strip()
-            if not channel_name:
-                client_socket.sendall("Channel name cannot be empty.\n".encode())
-                continue
-
-            if not nickname:
-                client_socket.sendall("You must set a nickname before joining channels.\n".encode())
-                continue
-
-            with lock:
-                if channel_name not in channels:
-                    channels[channel_name] = set()
-                channels[channel_name].add(nickname)
-
-            client_socket.sendall(f"You have joined channel '{channel_name}'.\n".encode())
-
-        elif message.startswith("/send "):
-            # /send <channel> <message>
-            parts = message.split(" ", 2)
-            if len(parts) < 3:
-                client_socket.sendall("Usage: /send <channel> <message>\n".encode())
-                continue
-
-            channel_name, msg = parts[1], parts[2]
-            if not nickname:
-                client_socket.sendall("You must set a nickname before sending messages.\n".encode())
-                continue
-
-            with lock:
-                if channel_name not in channels or nickname not in channels[channel_name]:
-                    client_socket.sendall(f"You must join channel '{channel_name}' before sending messages there.\n".encode())
-                    continue
-
-            # Broadcast this message to the channel
-            broadcast_channel_message(nickname, channel_name, msg)
-
-        elif message.startswith("/pm "):
-            # /pm <targetNick> <message>
-            parts = message.split(" ", 2)
-            if len(parts) < 3:
-                client_socket.sendall("Usage: /pm <nick> <message>\n".encode())
-                continue
-
-            target_nick, msg = parts[1], parts[2]
-            if not nickname:
-                client_socket.sendall("You must set a nickname before sending private messages.\n".encode())
-                continue
+        message = line.decode("utf-8", errors="replace")
 
-            private_message(nickname, target_nick, msg)
-
-        elif message == "/quit":
-            client_socket.sendall("Disconnecting...\n".encode())
+        if message == "/quit":
+            client.push(_BYE)
             break
 
-        else:
-            # Unknown command or direct text. 
+        # Command dispatch
+        cmd, _, rest = message.partition(" ")
+        fn = HANDLERS.get(cmd)
+        if fn is None:
+            # Unknown command or direct text.
             # You could handle raw chat messages here if you want them to go to a default channel.
-            client_socket.sendall("Unknown command. Try /nick, /join, /send, /pm, or /quit.\n".encode())
+            client.push(_ERR_UNKNOWN)
+            continue
+
+        nickname = fn(client, nickname, rest)
 
     # If we reach here, the client is disconnecting
-    with lock:
-        if nickname and nickname in clients:
-            del clients[nickname]
-            # Remove from all channels
-            for ch in channels.values():
-                if nickname in ch:
-                    ch.remove(nickname)
-
-    client_socket.close()
+    if nickname:
+        _evict(nickname)
+
+    await client.aclose()
     print(f"Client disconnected: {client_address}")
 
-def start_server(host="0.0.0.0", port=12345):
+async def main(host="0.0.0.0", port=12345, backlog=128):
     """
     Starts the TCP server on the specified host and port,
-    and listens indefinitely for client connections.
+    and serves client connections on the event loop indefinitely.
+    'backlog' bounds the kernel's queue of not-yet-accepted connections.
     """
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind((host, port))
-    server_socket.listen(5)  # up to 5 pending connections
+    server = await asyncio.start_server(handle, host, port, backlog=backlog)
     print(f"Server listening on {host}:{port} ...")
 
+    async with server:
+        try:
+            # The server is already accepting connections; just wait to be
+            # cancelled. serve_forever() would instead wait for every client
+            # to hang up before this cleanup could run (Python 3.12+).
+            await asyncio.get_running_loop().create_future()
+        finally:
+            # Drop every open connection and let its handler finish its
+            # normal cleanup, rather than leave them to block shutdown
+            for client in list(connections.values()):
+                client.mark_dead()
+            await asyncio.gather(*connections, return_exceptions=True)
+
+def start_server(host="0.0.0.0", port=12345):
+    """
+    Runs the server's event loop until interrupted.
+    """
     try:
-        while True:
-            client_socket, client_address = server_socket.accept()
-            print(f"New connection from {client_address}")
-            thread = threading.Thread(
-                target=handle_client_connection,
-                args=(client_socket, client_address),
-                daemon=True
-            )
-            thread.start()
+        asyncio.run(main(host, port))
     except KeyboardInterrupt:
         print("\nServer shutting down.")
-    finally:
-        server_socket.close()
 
 if __name__ == "__main__":
     # To run the server, do: python server.py [PORT]
@@ -199,6 +336,6 @@ if __name__ == "__main__":
     if len(sys.argv) >= 2:
         port = int(sys.argv[1])
     else:
-        port = 12345 
+        port = 12345
 
     start_server(port=port)